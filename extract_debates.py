@@ -1,72 +1,136 @@
-import json, re, math, itertools
+import re, math, itertools, os, functools, bisect, hashlib, pickle, shutil, tempfile
 from collections import defaultdict
-import pdfplumber
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import ahocorasick
+import numpy as np
+import orjson
+import pymupdf
+import torch
 from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
 from rapidfuzz import fuzz, process
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+HSPACE_RE = re.compile(r"[ \t]+")
+HYPHEN_BREAK_RE = re.compile(r"(\w)-\n(\w)")
 
 def extract_text_blocks(pdf_path):
-    text = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-           
-            t = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
-            text.append(t)
+    # sequential: MuPDF extracts hundreds of pages in well under a second, less than
+    # the start-up cost of a single worker process
+    with pymupdf.open(pdf_path) as doc:
+        text = [(page.get_text("text") or "").rstrip("\n") for page in doc]
     whole = "\n".join(text)
    
-    whole = re.sub(r"[ \t]+", " ", whole)
+    whole = HSPACE_RE.sub(" ", whole)
     
-    whole = re.sub(r"(\w)-\n(\w)", r"\1\2", whole)
+    whole = HYPHEN_BREAK_RE.sub(r"\1\2", whole)
     return whole
 
 
-DEBATE_HEADING_RE = re.compile(
-    r"(?P<title>([A-Z][A-Za-z’'().:&/\- ]+?))(?:\n| )(?=\d+\.\s|\[?\d{6,}\]?|Topical Questions|Business of the House|Women|Access|Charities|Sports|Creative|Community|Poverty|House of Commons|Christians|Project Spire)",
-    flags=re.MULTILINE,
+# A debate heading is a run of title characters starting with a capital, followed by
+# a space/newline and then one of these keywords or a numbered/reference anchor.
+HEADING_KEYWORDS = (
+    "Topical Questions", "Business of the House", "Women", "Access", "Charities", "Sports",
+    "Creative", "Community", "Poverty", "House of Commons", "Christians", "Project Spire",
 )
+HEADING_TITLE_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz’'().:&/- ")
+HEADING_START_RE = re.compile(r"[A-Z]")
+HEADING_NUMERIC_ANCHOR_RE = re.compile(r"[ \n](?=\d+\.\s|\[?\d{6,})")
 
-SPEAKER_LINE_RE = re.compile(
-    r"(?m)^(?P<name>[A-Z][A-Za-z .’'-\-]+(?:\([^)]+\))?(?:\s*\([A-Za-z/ \-]+\))?)\s*:\s"
-)
+HEADING_AUTOMATON = ahocorasick.Automaton()
+for _kw in HEADING_KEYWORDS:
+    HEADING_AUTOMATON.add_word(_kw, len(_kw))
+HEADING_AUTOMATON.make_automaton()
+
+SPEAKER_LINE_PATTERN = r"(?P<name>[A-Z][A-Za-z .’'-\-]+(?:\([^)]+\))?(?:\s*\([A-Za-z/ \-]+\))?)\s*:\s"
+SPEAKER_LINE_RE = re.compile(r"(?m)^" + SPEAKER_LINE_PATTERN)
+# a debate can start mid-line, where "^" does not match at the search position
+SPEAKER_HEAD_RE = re.compile(SPEAKER_LINE_PATTERN)
+
+def find_debate_headings(raw_text):
+    
+    # separator positions directly in front of a keyword or numeric anchor
+    seps = {m.start() for m in HEADING_NUMERIC_ANCHOR_RE.finditer(raw_text)}
+    for end, kw_len in HEADING_AUTOMATON.iter(raw_text):
+        p = end - kw_len
+        if p >= 0 and raw_text[p] in " \n":
+            seps.add(p)
+
+    # leftmost-first, non-overlapping scan: for each separator in order, the title is
+    # the earliest capital (at or after the cursor) in the title-character run before it
+    positions = []
+    cursor = 0
+    for p in sorted(seps):
+        if p - 2 < cursor:
+            continue
+        if raw_text[p - 1] not in HEADING_TITLE_CHARS:
+            continue
+        lo = p - 1
+        while lo > cursor and raw_text[lo - 1] in HEADING_TITLE_CHARS:
+            lo -= 1
+        m = HEADING_START_RE.search(raw_text, lo, p - 1)
+        if not m:
+            continue
+        positions.append((m.start(), raw_text[m.start():p].strip()))
+        cursor = p + 1
+    return positions
 
 def split_debates(raw_text):
-  
-    positions = [(m.start(), m.group("title").strip()) for m in DEBATE_HEADING_RE.finditer(raw_text)]
+    # debates are (start, end) offsets into raw_text; nothing is sliced until speeches are parsed
+    positions = find_debate_headings(raw_text)
     if not positions:
-        return [{"title": "Debate", "text": raw_text}]
+        return [{"title": "Debate", "start": 0, "end": len(raw_text)}]
     debates = []
     for idx, (start, title) in enumerate(positions):
         end = positions[idx+1][0] if idx+1 < len(positions) else len(raw_text)
-        debates.append({"title": title, "text": raw_text[start:end].strip()})
+        while end > start and raw_text[end-1].isspace():
+            end -= 1
+        debates.append({"title": title, "start": start, "end": end})
     return debates
 
-def parse_speeches(section_text):
+def parse_speeches(raw_text, start=0, end=None):
     
+    end = len(raw_text) if end is None else end
+    head = None
+    if start > 0 and raw_text[start-1] != "\n":
+        head = SPEAKER_HEAD_RE.match(raw_text, start, end)
+    if head:
+        matches = [head, *SPEAKER_LINE_RE.finditer(raw_text, head.end(), end)]
+    else:
+        matches = list(SPEAKER_LINE_RE.finditer(raw_text, start, end))
+
     chunks = []
-    indices = [m.start() for m in SPEAKER_LINE_RE.finditer(section_text)]
-    if not indices:
-        return []
-    indices.append(len(section_text))
-    for i in range(len(indices)-1):
-        s = section_text[indices[i]:indices[i+1]]
-        m = SPEAKER_LINE_RE.match(s)
-        if not m:
-            continue
+    for i, m in enumerate(matches):
+        stop = matches[i+1].start() if i+1 < len(matches) else end
         speaker = m.group("name").strip()
-        speech = s[m.end():].strip()
+        speech = raw_text[m.end():stop].strip()
         chunks.append({"speaker_raw": speaker, "speech_text": collapse_paragraphs(speech)})
     return chunks
 
+PARA_RE = re.compile(r"\n{2,}")
+NEWLINE_RE = re.compile(r"\n")
+MULTISPACE_RE = re.compile(r"\s{2,}")
+
 def collapse_paragraphs(t):
    
-    t = re.sub(r"\n{2,}", " <PARA> ", t)
-    t = re.sub(r"\n", " ", t)
-    return re.sub(r"\s{2,}", " ", t).strip()
+    t = PARA_RE.sub(" <PARA> ", t)
+    t = NEWLINE_RE.sub(" ", t)
+    return MULTISPACE_RE.sub(" ", t).strip()
 
 
 SPEAKER_META_RE = re.compile(r"^(?P<name>.+?)(?:\s*\((?P<constit>[^)]+)\))?(?:\s*\((?P<party>[^)]+)\))?$")
 
 def parse_speaker_meta(s):
+    # copy so callers never mutate the cached dict
+    return dict(_parse_speaker_meta(s))
+
+@functools.lru_cache(maxsize=1024)
+def _parse_speaker_meta(s):
     m = SPEAKER_META_RE.match(s)
     if not m:
         return {"name": s}
@@ -78,14 +142,133 @@ def parse_speaker_meta(s):
 
 
 
-def build_ner():
+NER_MODEL = "dslim/bert-base-NER"
+# branch, tag or commit SHA to load; caches are keyed on the commit it resolves to
+NER_MODEL_REVISION = "main"
+NER_BATCH_SIZE = 16
+# token overlap between 512-token windows when a speech exceeds the model length
+NER_STRIDE = 32
+USE_ORT = True
+NER_TORCH_COMPILE = True
+CACHE_DIR = Path.home() / ".cache" / "extract_debates"
+ORT_CACHE_DIR = CACHE_DIR / "onnx"
+
+def _resolved_ner_revision():
+    # commit SHA that NER_MODEL_REVISION resolves to in the local Hugging Face cache
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        path = try_to_load_from_cache(NER_MODEL, "config.json", revision=NER_MODEL_REVISION)
+    except Exception:
+        path = None
+    return Path(path).parent.name if isinstance(path, str) else NER_MODEL_REVISION
+
+def _ort_model_dir():
+    return ORT_CACHE_DIR / NER_MODEL.replace("/", "__") / _resolved_ner_revision() / "int8"
+
+def _device():
+    return 0 if torch.cuda.is_available() else -1
+
+def _optimize_model(model):
+    # fp16 on GPU, dynamic int8 Linear layers on CPU
+    if torch.cuda.is_available():
+        return model.half()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _build_ort_ner_model():
+    # export once to ONNX + dynamic int8, cached on disk
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForTokenClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    quant_dir = _ort_model_dir()
+    if not (quant_dir / "model_quantized.onnx").exists():
+        # build in a private temp dir and rename into place, so concurrent or
+        # interrupted runs never leave a half-written model in the shared cache
+        quant_dir.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=quant_dir.parent))
+        try:
+            ORTModelForTokenClassification.from_pretrained(
+                NER_MODEL, revision=NER_MODEL_REVISION, export=True
+            ).save_pretrained(tmp / "export")
+            qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            ORTQuantizer.from_pretrained(tmp / "export").quantize(save_dir=tmp / "int8", quantization_config=qconfig)
+            try:
+                os.replace(tmp / "int8", quant_dir)
+            except OSError:
+                # another run finished first
+                if not (quant_dir / "model_quantized.onnx").exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opts.intra_op_num_threads = os.cpu_count() or 1
+    return ORTModelForTokenClassification.from_pretrained(
+        quant_dir, file_name="model_quantized.onnx", session_options=opts
+    )
+
+def _build_torch_ner_model():
+    # native fused SDPA attention (supersedes optimum's BetterTransformer for BERT)
+    model = AutoModelForTokenClassification.from_pretrained(
+        NER_MODEL, revision=NER_MODEL_REVISION, attn_implementation="sdpa"
+    )
+    model = _optimize_model(model.eval())
+    # compile the fp16 GPU forward on PyTorch 2+; the int8 CPU path stays eager
+    if NER_TORCH_COMPILE and hasattr(torch, "compile") and torch.cuda.is_available():
+        model.forward = torch.compile(model.forward, dynamic=True)
+    return model
+
+def build_ner(batch_size=NER_BATCH_SIZE):
     
-    return pipeline(
+    tok = AutoTokenizer.from_pretrained(NER_MODEL, revision=NER_MODEL_REVISION)
+    model = None
+    if USE_ORT and not torch.cuda.is_available():
+        try:
+            model = _build_ort_ner_model()
+            backend = "ort-int8"
+        except Exception:
+            # missing optimum/onnxruntime or a failed export: use the PyTorch path
+            model = None
+    if model is None:
+        model = _build_torch_ner_model()
+        backend = "torch-fp16-cuda" if torch.cuda.is_available() else "torch-int8-cpu"
+    ner = pipeline(
         "token-classification",
-        model="dslim/bert-base-NER",
+        model=model,
+        tokenizer=tok,
         aggregation_strategy="simple",
-        device=-1
+        stride=NER_STRIDE,
+        batch_size=batch_size,
+        device=_device()
     )
+    # the backends give slightly different outputs; process_pdf keys its cache on this
+    ner.backend = backend
+    return ner
+
+def _expected_ner_backend():
+    # what build_ner will pick, without loading anything; only used for cache lookups
+    if torch.cuda.is_available():
+        return "torch-fp16-cuda"
+    if USE_ORT and (_ort_model_dir() / "model_quantized.onnx").exists():
+        return "ort-int8"
+    return "torch-int8-cpu"
+
+def run_ner(ner, texts, batch_size=NER_BATCH_SIZE):
+    
+    idx = [i for i, t in enumerate(texts) if t]
+    results = [[] for _ in texts]
+    if not idx:
+        return results
+    # smart batching: feed speeches shortest-first so each batch pads to a similar length;
+    # character length is a near-free proxy for token length
+    idx.sort(key=lambda i: len(texts[i]))
+    outputs = ner([texts[i] for i in idx], batch_size=batch_size)
+    for i, ents_raw in zip(idx, outputs):
+        results[i] = clean_entities(ents_raw)
+    return results
+
+SLASH_RE = re.compile(r"\s+/+\s+")
 
 def clean_entities(ents):
     out = []
@@ -94,109 +277,219 @@ def clean_entities(ents):
         if not txt or len(txt) == 1 and not txt.isalnum():
             continue
         
-        txt = re.sub(r"\s+/+\s+", "/", txt)
+        txt = SLASH_RE.sub("/", txt)
         out.append({"text": txt, "type": e["entity_group"], "score": float(e.get("score", 0.0))})
     return out
 
 
+# REBEL (~1.5 GB) is opt-in; by default relations come from the fallback question miner
+USE_REBEL = os.getenv("EXTRACT_DEBATES_USE_REBEL", "") not in ("", "0")
+
 def try_build_re():
     try:
         from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
         tok = AutoTokenizer.from_pretrained("Babelscape/rebel-large")
-        mod = AutoModelForSeq2SeqLM.from_pretrained("Babelscape/rebel-large")
-        gen = pipeline("text2text-generation", model=mod, tokenizer=tok)
+        mod = _optimize_model(AutoModelForSeq2SeqLM.from_pretrained("Babelscape/rebel-large").eval())
+        gen = pipeline("text2text-generation", model=mod, tokenizer=tok, device=_device())
         return gen
     except Exception:
         return None
 
-def extract_relations(gen, text, max_len=350):
-   
-    sents = [text[i:i+max_len] for i in range(0, len(text), max_len)]
-    triples = []
+# \0 is excluded from the character classes so a match never spans two joined speeches
+FALLBACK_Q_RE = re.compile(r"(?:what|which)\s+(?:steps|progress|support)[^?\0]*?(?:on|to|for)\s+([^?\0]+)\?", re.I)
+REBEL_TRIPLET_RE = re.compile(r"<triplet>\s*(.*?)\s*\|\s*(.*?)\s*\|\s*(.*?)\s*</triplet>")
+
+REBEL_BATCH_SIZE = 8
+REBEL_MIN_CHARS = 40
+
+def _fallback_relations(texts):
+    # one scan over all speeches joined by \0, mapping each match back to its speech
+    joined = "\0".join(texts)
+    ends = list(itertools.accumulate(len(t) + 1 for t in texts))
+    triples = [[] for _ in texts]
+    for m in FALLBACK_Q_RE.finditer(joined):
+        topic = m.group(1).strip(" .;:)")
+        triples[bisect.bisect_right(ends, m.start())].append(("MP", "asks_about", topic))
+    return triples
+
+def extract_relations_batch(gen, texts, max_len=350, batch_size=REBEL_BATCH_SIZE, min_chars=REBEL_MIN_CHARS):
+    
     if gen is None:
-       
-        for m in re.finditer(r"(?:what|which)\s+(?:steps|progress|support)[^?]*?(?:on|to|for)\s+([^?]+)\?", text, flags=re.I):
-            topic = m.group(1).strip(" .;:)")
-            triples.append(("MP", "asks_about", topic))
-        return triples
+        return _fallback_relations(texts)
+
+    # flatten every speech's chunks into one generation batch, remembering the owner
+    chunks, owners = [], []
+    for idx, text in enumerate(texts):
+        if len(text) < min_chars:
+            continue
+        for i in range(0, len(text), max_len):
+            chunks.append(text[i:i+max_len])
+            owners.append(idx)
 
-    for chunk in sents:
-        out = gen(chunk, max_length=256, do_sample=False)
-        if not out: 
+    triples = [[] for _ in texts]
+    if not chunks:
+        return triples
+    outputs = gen(chunks, batch_size=batch_size, max_length=256, num_beams=1, do_sample=False)
+    for idx, out in zip(owners, outputs):
+        if isinstance(out, list):
+            out = out[0] if out else None
+        if not out:
             continue
-        text_out = out[0]["generated_text"]
+        text_out = out["generated_text"]
         
-        for subj, rel, obj in re.findall(r"<triplet>\s*(.*?)\s*\|\s*(.*?)\s*\|\s*(.*?)\s*</triplet>", text_out):
-            triples.append((subj.strip(), rel.strip(), obj.strip()))
+        for subj, rel, obj in REBEL_TRIPLET_RE.findall(text_out):
+            triples[idx].append((subj.strip(), rel.strip(), obj.strip()))
     return triples
 
 
+NORMKEY_STRIP_RE = re.compile(r"[^\w\s&\-./]")
+
+@functools.lru_cache(maxsize=8192)
 def normalize_key(s):
-    s = re.sub(r"[^\w\s&\-./]", "", s).strip().lower()
-    s = re.sub(r"\s{2,}", " ", s)
+    s = NORMKEY_STRIP_RE.sub("", s).strip().lower()
+    s = MULTISPACE_RE.sub(" ", s)
     return s
 
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def _union_pairs(n, rows, cols):
+    # union-find over the matching pairs; the earliest-seen key is each cluster's root
+    parent = np.arange(n)
+    for k in range(rows.shape[0]):
+        ri, rj = _find(parent, rows[k]), _find(parent, cols[k])
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    for i in range(n):
+        parent[i] = _find(parent, i)
+    return parent
+
+if njit is not None:
+    _find = njit(cache=True)(_find)
+    _union_pairs = njit(cache=True)(_union_pairs)
+
+def _cluster_keys(keys, sim_threshold):
+    # for each key, the index of the earliest-seen key in its fuzzy cluster
+    scores = process.cdist(
+        keys, keys,
+        scorer=fuzz.token_sort_ratio,
+        score_cutoff=sim_threshold,
+        workers=-1,
+    )
+    rows, cols = np.nonzero(np.triu(scores, k=1))
+    return _union_pairs(len(keys), rows.astype(np.int64), cols.astype(np.int64)).astype(np.intp)
+
 def build_entity_map(all_entities, sim_threshold=92):
     
-    canonical = {}
-    mentions = defaultdict(list)
+    if not all_entities:
+        return {}
+    # structure-of-arrays view of the mentions
+    n = len(all_entities)
+    texts = [e["text"] for e in all_entities]
+    types = [e["type"] for e in all_entities]
+    scores = np.fromiter((e.get("score", 0.0) for e in all_entities), dtype=np.float64, count=n)
+    key_ids = {}
+    key_idx = np.fromiter(
+        (key_ids.setdefault(normalize_key(t), len(key_ids)) for t in texts), dtype=np.intp, count=n
+    )
+    unique_keys = list(key_ids)
+    group = _cluster_keys(unique_keys, sim_threshold)[key_idx]
 
-    unique_texts = []
-    for e in all_entities:
-        unique_texts.append(e["text"])
+    # per group: first mention (canonical text, fallback type), mention count and the
+    # best-scoring mention (score desc, earliest first on ties)
+    groups, first = np.unique(group, return_index=True)
+    counts = np.bincount(group)
+    ranked = np.lexsort((np.arange(n), -scores, group))
+    best = ranked[np.searchsorted(group[ranked], groups)]
+    mentions = defaultdict(set)
+    for g, t in zip(group.tolist(), texts):
+        mentions[g].add(t)
 
-    for txt in unique_texts:
-        nk = normalize_key(txt)
-        if nk in canonical:
-            continue
-      
-        choices = list(canonical.keys())
-        if choices:
-            best, score, _ = process.extractOne(nk, choices, scorer=fuzz.token_sort_ratio)
-            if score >= sim_threshold:
-                canon = best
-            else:
-                canon = nk
-        else:
-            canon = nk
-        canonical[nk] = canon
-
-   
     out = {}
-    for e in all_entities:
-        nk = normalize_key(e["text"])
-        canon = canonical.get(nk, nk)
-        if canon not in out:
-            out[canon] = {"canonical": e["text"], "type": e["type"], "mentions": [], "count": 0}
-        out[canon]["mentions"].append(e["text"])
-        out[canon]["count"] += 1
-        
-        if "score" in e and e.get("score", 0) > 0 and out[canon].get("best_score", -1) < e["score"]:
-            out[canon]["type"] = e["type"]
-            out[canon]["best_score"] = e["score"]
-    
-    for k in out:
-        out[k]["mentions"] = sorted(set(out[k]["mentions"]))
-        out[k].pop("best_score", None)
+    for gi in np.argsort(first, kind="stable"):
+        g, f, b = int(groups[gi]), int(first[gi]), int(best[gi])
+        out[unique_keys[g]] = {
+            "canonical": texts[f],
+            "type": types[b] if scores[b] > 0 else types[f],
+            "mentions": sorted(mentions[g]),
+            "count": int(counts[g]),
+        }
     return out
 
 
-def process_pdf(pdf_path, out_path):
-    text = extract_text_blocks(pdf_path)
+# bump when extraction or NER post-processing changes, to invalidate cached results
+CACHE_VERSION = 1
+
+def _cache_path(pdf_bytes, backend):
+    h = hashlib.blake2b(pdf_bytes, digest_size=20)
+    h.update(f"|{CACHE_VERSION}|{NER_MODEL}@{_resolved_ner_revision()}|stride={NER_STRIDE}|{backend}".encode())
+    return CACHE_DIR / f"{h.hexdigest()}.pkl"
+
+def _load_cache(path):
+    # anything unreadable, stale or malformed is treated as a miss
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or not all(k in data for k in ("text", "texts", "ner")):
+        return None
+    if not isinstance(data["text"], str) or len(data["texts"]) != len(data["ner"]):
+        return None
+    return data
+
+def _save_cache(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def process_pdf(pdf_path, out_path, use_cache=True, ner_loader=build_ner, re_loader=try_build_re):
+    # extracted text and NER output are pure functions of the PDF bytes and the NER model
+    pdf_bytes = Path(pdf_path).read_bytes()
+    cached = _load_cache(_cache_path(pdf_bytes, _expected_ner_backend())) if use_cache else None
+
+    # model loading is independent of the PDF, so overlap it with text extraction
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        fut_re = ex.submit(re_loader) if USE_REBEL else None
+        if cached is None:
+            fut_text = ex.submit(extract_text_blocks, pdf_path)
+            fut_ner = ex.submit(ner_loader)
+            text, ner = fut_text.result(), fut_ner.result()
+        else:
+            text, ner = cached["text"], None
+        re_gen = fut_re.result() if fut_re else None
     debates = split_debates(text)
 
-    ner = build_ner()
-    re_gen = try_build_re()
+    # run the models once over every speech in the document, then split back per debate
+    speeches_per_debate = [parse_speeches(text, d["start"], d["end"]) for d in debates]
+    texts = [sp["speech_text"] for speeches in speeches_per_debate for sp in speeches]
+    if cached is not None and cached["texts"] == texts:
+        ner_outputs = cached["ner"]
+    else:
+        ner = ner or ner_loader()
+        ner_outputs = run_ner(ner, texts)
+        # store under the backend that actually ran, never the predicted one
+        backend = getattr(ner, "backend", None)
+        if use_cache and backend:
+            _save_cache(_cache_path(pdf_bytes, backend), {"text": text, "texts": texts, "ner": ner_outputs})
+    rel_outputs = extract_relations_batch(re_gen, texts)
 
     final = {"debates": []}
-    for d in debates:
-        speeches = parse_speeches(d["text"])
+    offset = 0
+    for d, speeches in zip(debates, speeches_per_debate):
         all_ents = []
         enriched = []
-        for sp in speeches:
+        n = len(speeches)
+        for sp, ents, rels in zip(speeches, ner_outputs[offset:offset+n], rel_outputs[offset:offset+n]):
             meta = parse_speaker_meta(sp["speaker_raw"])
-            ents = clean_entities(ner(sp["speech_text"])) if sp["speech_text"] else []
-            rels = extract_relations(re_gen, sp["speech_text"])
             all_ents.extend(ents)
             enriched.append({
                 "speaker": meta,
@@ -204,6 +497,7 @@ def process_pdf(pdf_path, out_path):
                 "entities": ents,
                 "relations": [{"subject": s, "predicate": p, "object": o} for (s, p, o) in rels]
             })
+        offset += n
         entity_map = build_entity_map(all_ents)
         final["debates"].append({
             "title": d["title"],
@@ -211,8 +505,8 @@ def process_pdf(pdf_path, out_path):
             "entity_map": entity_map
         })
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(final, f, ensure_ascii=False, indent=2)
+    with open(out_path, "wb") as f:
+        f.write(orjson.dumps(final, option=orjson.OPT_INDENT_2))
 
 if __name__ == "__main__":
   
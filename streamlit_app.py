@@ -5,9 +5,8 @@ import io
 import os
 import sys
 import json
-import shutil
 import tempfile
-import subprocess
+import importlib
 from pathlib import Path
 from typing import List
 
@@ -26,6 +25,21 @@ if not EXTRACTOR_SRC.exists():
              "Please ensure both files are in the same folder.")
     st.stop()
 
+if str(HERE) not in sys.path:
+    sys.path.insert(0, str(HERE))
+extract_debates = importlib.import_module("extract_debates")
+
+
+@st.cache_resource(show_spinner="Loading NER model…")
+def load_ner():
+    return extract_debates.build_ner()
+
+
+@st.cache_resource(show_spinner="Loading relation model…")
+def load_re():
+    return extract_debates.try_build_re()
+
+
 uploaded = st.file_uploader(
     "Drag & drop a PDF here, or click to browse",
     type=["pdf"],
@@ -34,7 +48,7 @@ uploaded = st.file_uploader(
 )
 
 st.markdown(
-    "> runs `python extract_debates.py` in a temporary working folder. "
+    "> runs `extract_debates.process_pdf` in-process on a temporary working folder. "
     "JSON script will appear below for download or in the main folder of the document."
 )
 
@@ -50,51 +64,33 @@ st.write(f"Working in: `{workdir}`")
 
 
 pdf_bytes = uploaded.read()
-(doc_path := workdir / "document").write_bytes(pdf_bytes)
 (doc_pdf_path := workdir / "document.pdf").write_bytes(pdf_bytes)
+out_path = workdir / "output_enhanced.json"
 
+# load the cached models here on the script thread (process_pdf's worker threads
+# have no ScriptRunContext) and hand the objects in
+ner = load_ner()
+re_gen = load_re() if extract_debates.USE_REBEL else None
 
-shutil.copy2(EXTRACTOR_SRC, workdir / "extract_debates.py")
-
-
-before_files = {p.name for p in workdir.iterdir()}
-
-
-py_exe = sys.executable or "python"
-cmd = [py_exe, "-u", "extract_debates.py"]
-st.code(" ".join(cmd), language="bash")
-
+new_files_paths = []
 with st.spinner("Running your extractor…"):
-    proc = subprocess.run(
-        cmd,
-        cwd=str(workdir),
-        capture_output=True,
-        text=True
-    )
-
-
-st.subheader("Logs")
-logs = ""
-if proc.stdout:
-    logs += f"STDOUT:\n{proc.stdout}\n"
-if proc.stderr:
-    logs += f"\nSTDERR:\n{proc.stderr}\n"
-if not logs.strip():
-    logs = "(No output)"
-st.text_area("Process output", value=logs, height=240)
-
-
-after_files = {p.name for p in workdir.iterdir()}
-new_files = [f for f in (after_files - before_files) if f.lower().endswith(".json")]
-new_files_paths = [workdir / f for f in sorted(new_files)]
-
-if proc.returncode != 0:
-    st.error(f"Extractor exited with code {proc.returncode}. "
-             "If no JSON was produced, check the logs above.")
-elif not new_files_paths:
-    st.warning("The script finished, but no new .json files were found in the working folder. "
-               "Check the logs above to see where it saved output (if any).")
-else:
+    try:
+        extract_debates.process_pdf(
+            str(doc_pdf_path),
+            str(out_path),
+            ner_loader=lambda: ner,
+            re_loader=lambda: re_gen,
+        )
+    except Exception as e:
+        st.error(f"Extractor failed: {e}")
+        st.exception(e)
+    else:
+        if out_path.exists():
+            new_files_paths.append(out_path)
+        else:
+            st.warning("The extractor finished, but no .json file was written to the working folder.")
+
+if new_files_paths:
     st.success(f"Done! Found {len(new_files_paths)} JSON file(s).")
 
 
@@ -0,0 +1,218 @@
+import pickle
+import random
+import re
+
+import pytest
+import torch
+from transformers import BertConfig, BertForTokenClassification, BertTokenizerFast, pipeline
+
+import extract_debates as ed
+
+
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]",
+         "hello", "world", "mr", "smith", "asks", "the", "minister"]
+
+
+@pytest.fixture(scope="module")
+def tiny_ner(tmp_path_factory):
+    # tiny local BERT whose classifier tags every token B-PER, so each word comes back as an entity
+    vocab_file = tmp_path_factory.mktemp("tok") / "vocab.txt"
+    vocab_file.write_text("\n".join(VOCAB) + "\n")
+    tok = BertTokenizerFast(vocab_file=str(vocab_file), model_max_length=512)
+    labels = {0: "O", 1: "B-PER", 2: "I-PER"}
+    config = BertConfig(
+        vocab_size=len(VOCAB), hidden_size=8, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=16, num_labels=len(labels),
+        id2label=labels, label2id={v: k for k, v in labels.items()},
+    )
+    torch.manual_seed(0)
+    model = BertForTokenClassification(config).eval()
+    with torch.no_grad():
+        model.classifier.weight.zero_()
+        model.classifier.bias.copy_(torch.tensor([0.0, 10.0, 0.0]))
+    return pipeline(
+        "token-classification", model=model, tokenizer=tok,
+        aggregation_strategy="simple", device=-1,
+    )
+
+
+def test_run_ner_smoke(tiny_ner):
+    texts = ["hello world", "", "mr smith asks the minister"]
+    out = ed.run_ner(tiny_ner, texts, batch_size=2)
+    assert len(out) == len(texts)
+    assert out[1] == []
+    for text, ents in zip(texts, out):
+        for e in ents:
+            assert e["text"] in text.split()
+            assert e["type"] == "PER"
+            assert isinstance(e["score"], float)
+    assert out[0] and out[2]
+
+
+def test_run_ner_restores_input_order(tiny_ner):
+    # speeches are batched shortest-first; results must still line up with their inputs
+    texts = ["mr smith asks the minister hello world", "hello", "", "the minister", "world smith"]
+    out = ed.run_ner(tiny_ner, texts, batch_size=2)
+    for text, ents in zip(texts, out):
+        assert {e["text"] for e in ents} == set(text.split())
+
+
+# the heading regex find_debate_headings replaced; kept as the reference behaviour
+BASELINE_HEADING_RE = re.compile(
+    r"(?P<title>([A-Z][A-Za-z’'().:&/\- ]+?))(?:\n| )(?=\d+\.\s|\[?\d{6,}\]?|Topical Questions|Business of the House|Women|Access|Charities|Sports|Creative|Community|Poverty|House of Commons|Christians|Project Spire)",
+    flags=re.MULTILINE,
+)
+
+HEADING_TOKENS = [
+    "Women", "Access", "House of Commons", "Topical Questions", "12. ", "1234567", "[123456]",
+    "Hello", "a", "b", " ", "\n", "X", "’", ".", "-", "Wo", "(", ":",
+]
+
+
+def test_find_debate_headings_matches_baseline_regex():
+    rng = random.Random(0)
+    cases = ["", "Housing Women 1. Topic", "Energy Prices\n[123456] Mr A: hi", "x Women"]
+    cases += ["".join(rng.choice(HEADING_TOKENS) for _ in range(rng.randint(0, 40))) for _ in range(5000)]
+    for text in cases:
+        expected = [(m.start(), m.group("title").strip()) for m in BASELINE_HEADING_RE.finditer(text)]
+        assert ed.find_debate_headings(text) == expected, repr(text)
+
+
+def test_parse_speeches_debate_starting_mid_line():
+    text = "said so. Mr Smith: Women matter\nThe Minister: agreed\nMr Jones: \nEnergy Women 1. x"
+    first = ed.split_debates(text)[0]
+    # the heading starts mid-line, so "^" cannot match the first speaker at `start`
+    assert first["title"] == "Mr Smith:"
+    assert text[first["start"] - 1] == " "
+    # trailing whitespace is trimmed off `end`, so "Mr Jones: " is not a speaker line
+    assert text[first["start"]:first["end"]].endswith("Mr Jones:")
+    assert ed.parse_speeches(text, first["start"], first["end"]) == [
+        {"speaker_raw": "Mr Smith", "speech_text": "Women matter"},
+        {"speaker_raw": "The Minister", "speech_text": "agreed Mr Jones:"},
+    ]
+
+
+def _baseline_debate_speeches(text):
+    # split_debates + parse_speeches as they were before debates became offsets
+    positions = [(m.start(), m.group("title").strip()) for m in BASELINE_HEADING_RE.finditer(text)]
+    if not positions:
+        sections = [("Debate", text)]
+    else:
+        sections = [
+            (title, text[start:positions[i+1][0] if i+1 < len(positions) else len(text)].strip())
+            for i, (start, title) in enumerate(positions)
+        ]
+    out = []
+    for title, section in sections:
+        indices = [m.start() for m in ed.SPEAKER_LINE_RE.finditer(section)] + [len(section)]
+        speeches = []
+        for a, b in zip(indices, indices[1:]):
+            m = ed.SPEAKER_LINE_RE.match(section[a:b])
+            speeches.append({
+                "speaker_raw": m.group("name").strip(),
+                "speech_text": ed.collapse_paragraphs(section[a:b][m.end():].strip()),
+            })
+        out.append((title, speeches))
+    return out
+
+
+def test_offset_speeches_match_baseline_slicing():
+    tokens = HEADING_TOKENS + ["Mr Smith", ": ", "(Lab)", "\n\n", "\t", "  ", "Mr A (Lab):", "Speaker"]
+    rng = random.Random(1)
+    for _ in range(5000):
+        text = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 40)))
+        got = [(d["title"], ed.parse_speeches(text, d["start"], d["end"])) for d in ed.split_debates(text)]
+        assert got == _baseline_debate_speeches(text), repr(text)
+
+
+def test_build_entity_map_grouping():
+    ents = [
+        {"text": "Labour Party", "type": "ORG", "score": 0.9},
+        {"text": "NHS", "type": "ORG", "score": 0.0},
+        {"text": "Party Labour", "type": "MISC", "score": 0.95},
+        {"text": "Labour  Party!", "type": "PER", "score": 0.95},
+        {"text": "NHS", "type": "MISC", "score": 0.0},
+        {"text": "Smith", "type": "PER", "score": 0.5},
+        {"text": "N.H.S", "type": "ORG", "score": 0.8},
+    ]
+    out = ed.build_entity_map(ents)
+    assert list(out.items()) == [
+        # fuzzy cluster: earliest text is canonical; best score wins the type, earliest on ties
+        ("labour party", {
+            "canonical": "Labour Party", "type": "MISC",
+            "mentions": ["Labour  Party!", "Labour Party", "Party Labour"], "count": 3,
+        }),
+        # only zero scores: the first mention's type is kept
+        ("nhs", {"canonical": "NHS", "type": "ORG", "mentions": ["NHS"], "count": 2}),
+        ("smith", {"canonical": "Smith", "type": "PER", "mentions": ["Smith"], "count": 1}),
+        ("n.h.s", {"canonical": "N.H.S", "type": "ORG", "mentions": ["N.H.S"], "count": 1}),
+    ]
+    assert ed.build_entity_map([]) == {}
+
+
+@pytest.fixture
+def hansard_pdf(tmp_path):
+    pymupdf = pytest.importorskip("pymupdf")
+    path = tmp_path / "document.pdf"
+    with pymupdf.open() as doc:
+        doc.new_page().insert_text(
+            (50, 72), "Housing Women 1. Topic\nMr Smith (Lab): hello world\nThe Minister: the minister hello"
+        )
+        doc.save(str(path))
+    return path
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / "cache"
+    monkeypatch.setattr(ed, "CACHE_DIR", path)
+    return path
+
+
+def _counting_loader(ner):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return ner
+    return load, calls
+
+
+def test_process_pdf_cache_hit_skips_ner_load(tiny_ner, hansard_pdf, cache_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(tiny_ner, "backend", ed._expected_ner_backend(), raising=False)
+    load, calls = _counting_loader(tiny_ner)
+    ed.process_pdf(hansard_pdf, tmp_path / "first.json", ner_loader=load)
+    assert len(calls) == 1
+    assert len(list(cache_dir.glob("*.pkl"))) == 1
+
+    ed.process_pdf(hansard_pdf, tmp_path / "second.json", ner_loader=load)
+    assert len(calls) == 1
+    assert (tmp_path / "first.json").read_bytes() == (tmp_path / "second.json").read_bytes()
+
+
+def test_process_pdf_cache_is_keyed_on_backend_that_ran(tiny_ner, hansard_pdf, cache_dir, tmp_path, monkeypatch):
+    # a result from another backend must not be served for the predicted one
+    monkeypatch.setattr(tiny_ner, "backend", "some-other-backend", raising=False)
+    load, calls = _counting_loader(tiny_ner)
+    ed.process_pdf(hansard_pdf, tmp_path / "out.json", ner_loader=load)
+    ed.process_pdf(hansard_pdf, tmp_path / "out.json", ner_loader=load)
+    assert len(calls) == 2
+    assert len(list(cache_dir.glob("*.pkl"))) == 1
+
+
+@pytest.mark.parametrize("payload", [b"not a pickle", "pickle:missing-keys"])
+def test_process_pdf_bad_cache_entry_is_a_miss(payload, tiny_ner, hansard_pdf, cache_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(tiny_ner, "backend", ed._expected_ner_backend(), raising=False)
+    entry = ed._cache_path(hansard_pdf.read_bytes(), tiny_ner.backend)
+    entry.parent.mkdir(parents=True)
+    entry.write_bytes(payload if isinstance(payload, bytes) else pickle.dumps({"text": "x"}))
+    load, calls = _counting_loader(tiny_ner)
+    ed.process_pdf(hansard_pdf, tmp_path / "out.json", ner_loader=load)
+    assert len(calls) == 1
+    assert ed._load_cache(entry) is not None
+
+
+def test_save_cache_failure_leaves_no_temp_file(cache_dir):
+    with pytest.raises(Exception):
+        ed._save_cache(cache_dir / "entry.pkl", {"text": "x", "texts": [], "ner": [], "bad": lambda: None})
+    assert list(cache_dir.iterdir()) == []